@@ -0,0 +1,564 @@
+# loadtest.py
+"""Concurrent load test for the experiment dashboard in `display.py`.
+
+Starts the app locally on synthetic applicant data and replays analyst
+sessions against Dash's `/_dash-update-component` endpoint from many
+concurrent asyncio clients. Each client loads the page, then moves the
+effect-size and days sliders, switches demographic plots and clicks
+"Begin Experiment", with a random think time between actions.
+
+Reports per-callback latency percentiles, throughput, error rate and server
+memory (RSS summed over the server process and its workers). Passing several
+values to `--workers` or `--rows` runs every combination and prints a
+comparison table; `--save` writes the results as JSON so runs can be
+compared later with the `compare` command.
+
+Examples
+--------
+    python loadtest.py run --clients 50 --duration 60
+    python loadtest.py run --server gunicorn --workers 1 4 8 --save runs.json
+    python loadtest.py run --rows 1000 20000 --clients 20
+    python loadtest.py compare before.json after.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:  # Fall back to /proc on Linux
+    psutil = None
+
+HERE = Path(__file__).resolve().parent
+
+DEGREES = [
+    "High School or Baccalaureate",
+    "Some College (1-3 years)",
+    "Bachelor's degree",
+    "Master's degree",
+    "Doctorate (e.g. PhD)",
+]
+COUNTRIES = ["NG", "PK", "IN", "US", "GB", "TR", "EG", "KE", "BR", "DE", "CN", "GH"]
+
+# Callback name -> (output, [(component id, property) for inputs], [state])
+CALLBACKS = {
+    "display_demo_graph": (
+        "demo-plots-display.children",
+        [("demo-plots-dropdown", "value")],
+        [],
+    ),
+    "display_group_size": (
+        "effect-size-display.children",
+        [("effect-size-slider", "value")],
+        [],
+    ),
+    "display_cdf_pct": (
+        "experiment-days-display.children",
+        [("effect-size-slider", "value"), ("experiment-days-slider", "value")],
+        [],
+    ),
+    "display_results": (
+        "results-display.children",
+        [("start-experiment-button", "n_clicks")],
+        [("experiment-days-slider", "value")],
+    ),
+}
+
+
+def make_synthetic_df(n_rows, seed=0):
+    """Build a DataFrame shaped like the applicant data `DFRepository` expects.
+
+    Parameters
+    ----------
+    n_rows : int
+        Number of applicants.
+    seed : int, optional
+        Random seed, by default 0
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    created = pd.Timestamp("2022-05-01") + pd.to_timedelta(
+        rng.uniform(0, 30 * 24 * 3600, n_rows), unit="s"
+    )
+    birthdays = pd.Timestamp("1975-01-01") + pd.to_timedelta(
+        rng.integers(0, 30 * 365, n_rows), unit="D"
+    )
+    return pd.DataFrame(
+        {
+            "_id": [f"{i:024x}" for i in range(n_rows)],
+            "firstName": "Test",
+            "lastName": [f"Applicant{i}" for i in range(n_rows)],
+            "email": [f"applicant{i}@example.com" for i in range(n_rows)],
+            "birthday": birthdays,
+            "gender": rng.choice(["male", "female"], n_rows),
+            "highestDegreeEarned": rng.choice(DEGREES, n_rows),
+            "countryISO2": rng.choice(COUNTRIES, n_rows),
+            "admissionsQuiz": rng.choice(["complete", "incomplete"], n_rows, p=[0.3, 0.7]),
+            "createdAt": created.sort_values(),
+        }
+    )
+
+
+def create_server():
+    """Return the Flask server of `display.app`, backed by synthetic data.
+
+    Data size and seed are read from the `LOADTEST_ROWS` and `LOADTEST_SEED`
+    environment variables. Also used as the gunicorn app factory.
+    """
+    sys.path.insert(0, str(HERE))
+    import business
+
+    df = make_synthetic_df(
+        int(os.environ.get("LOADTEST_ROWS", 5000)),
+        int(os.environ.get("LOADTEST_SEED", 0)),
+    )
+    # `display` calls `get_default_df` at import time
+    business.get_default_df = lambda: df
+    import display
+
+    return display.app.server
+
+
+def serve(args):
+    """Run the app with the Werkzeug server (used by `run --server werkzeug`)."""
+    server = create_server()
+    # Werkzeug can't combine threads and processes; fork per request if workers > 1
+    server.run(
+        host="127.0.0.1",
+        port=args.port,
+        debug=False,
+        threaded=args.workers == 1,
+        processes=args.workers,
+    )
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind, workers, rows, seed, port):
+    """Start the app in a subprocess.
+
+    Returns
+    -------
+    tuple
+        (subprocess.Popen, path of the log file capturing stderr)
+    """
+    env = dict(os.environ, LOADTEST_ROWS=str(rows), LOADTEST_SEED=str(seed))
+    if kind == "gunicorn":
+        cmd = [
+            sys.executable, "-m", "gunicorn",
+            "--workers", str(workers),
+            "--bind", f"127.0.0.1:{port}",
+            "--timeout", "120",
+            "loadtest:create_server()",
+        ]
+    else:
+        cmd = [
+            sys.executable, str(Path(__file__).resolve()), "serve",
+            "--port", str(port), "--workers", str(workers),
+        ]
+    log = tempfile.NamedTemporaryFile(prefix="loadtest-", suffix=".log", delete=False)
+    # The app prints a lot of debugging output; keep it off the console
+    proc = subprocess.Popen(
+        cmd, cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=log
+    )
+    return proc, log.name
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+async def http_request(port, method, path, body=None, timeout=30.0):
+    """Send one HTTP/1.1 request to localhost and return (status, body bytes)."""
+
+    async def _send():
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            payload = b"" if body is None else json.dumps(body).encode()
+            head = (
+                f"{method} {path} HTTP/1.1\r\n"
+                f"Host: 127.0.0.1:{port}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                "Connection: close\r\n\r\n"
+            )
+            writer.write(head.encode() + payload)
+            await writer.drain()
+            raw = await reader.read()
+        finally:
+            writer.close()
+        header, _, content = raw.partition(b"\r\n\r\n")
+        status = int(header.split(b" ", 2)[1])
+        if b"transfer-encoding: chunked" in header.lower():
+            content = _dechunk(content)
+        return status, content
+
+    return await asyncio.wait_for(_send(), timeout)
+
+
+def _dechunk(data):
+    out = bytearray()
+    while data:
+        size_line, _, data = data.partition(b"\r\n")
+        size = int(size_line.split(b";")[0], 16)
+        if size == 0:
+            break
+        out += data[:size]
+        data = data[size + 2:]
+    return bytes(out)
+
+
+async def wait_until_ready(port, proc, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            return False
+        try:
+            status, _ = await http_request(port, "GET", "/", timeout=5)
+            if status == 200:
+                return True
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+            pass
+        await asyncio.sleep(0.25)
+    return False
+
+
+def build_payload(name, values):
+    """Build the JSON body Dash's renderer posts for a callback.
+
+    Parameters
+    ----------
+    name : str
+        Key of `CALLBACKS`.
+    values : dict
+        Maps component id to the current value of its property.
+    """
+    output, inputs, state = CALLBACKS[name]
+    out_id, out_prop = output.split(".")
+    return {
+        "output": output,
+        "outputs": {"id": out_id, "property": out_prop},
+        "inputs": [{"id": i, "property": p, "value": values[i]} for i, p in inputs],
+        "changedPropIds": [f"{i}.{p}" for i, p in inputs[:1]],
+        "state": [{"id": i, "property": p, "value": values[i]} for i, p in state],
+    }
+
+
+class Stats:
+    """Collects per-callback latencies and errors."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = {}
+
+    def record(self, name, elapsed, error=None):
+        self.latencies[name].append(elapsed)
+        if error is not None:
+            self.errors[name] += 1
+            self.error_samples.setdefault(name, error)
+
+
+async def fire(port, stats, name, values, timeout):
+    """Trigger one callback and record how long it took."""
+    start = time.perf_counter()
+    error = None
+    try:
+        status, content = await http_request(
+            port, "POST", "/_dash-update-component", build_payload(name, values), timeout
+        )
+        if status != 200:
+            error = f"HTTP {status}"
+        elif b'"response"' not in content:
+            error = "missing 'response' in body"
+    except asyncio.TimeoutError:
+        error = "timeout"
+    except (OSError, ValueError, IndexError) as e:
+        error = f"{type(e).__name__}: {e}"
+    stats.record(name, time.perf_counter() - start, error)
+
+
+async def analyst(port, stats, deadline, think_time, timeout, rng):
+    """Simulate one analyst session until `deadline`."""
+    values = {
+        "demo-plots-dropdown": "Nationality",
+        "effect-size-slider": 0.2,
+        "experiment-days-slider": 1,
+        "start-experiment-button": 0,
+    }
+    # Page load fires every callback without `prevent_initial_call` in parallel
+    await asyncio.gather(
+        *(fire(port, stats, name, values, timeout) for name in CALLBACKS)
+    )
+    actions = ["effect", "days", "dropdown", "button"]
+    weights = [0.35, 0.3, 0.15, 0.2]
+    while time.monotonic() < deadline:
+        await asyncio.sleep(rng.expovariate(1 / think_time) if think_time > 0 else 0)
+        if time.monotonic() >= deadline:
+            break
+        action = rng.choices(actions, weights)[0]
+        if action == "effect":
+            values["effect-size-slider"] = round(rng.randint(1, 8) / 10, 1)
+            await asyncio.gather(
+                fire(port, stats, "display_group_size", values, timeout),
+                fire(port, stats, "display_cdf_pct", values, timeout),
+            )
+        elif action == "days":
+            values["experiment-days-slider"] = rng.randint(1, 20)
+            await fire(port, stats, "display_cdf_pct", values, timeout)
+        elif action == "dropdown":
+            values["demo-plots-dropdown"] = rng.choice(["Nationality", "Age", "Education"])
+            await fire(port, stats, "display_demo_graph", values, timeout)
+        else:
+            values["start-experiment-button"] += 1
+            await fire(port, stats, "display_results", values, timeout)
+
+
+def _proc_tree_rss(pid):
+    """Return RSS in bytes of `pid` and all its descendants, or None."""
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            procs = [root] + root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return None
+        total = 0
+        for p in procs:
+            try:
+                total += p.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        return total
+
+    proc_dir = Path("/proc")
+    if not proc_dir.is_dir():
+        return None
+    parents = {}
+    for stat in proc_dir.glob("[0-9]*/stat"):
+        try:
+            # Fields after the parenthesised command name: state, ppid, ...
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+            parents[int(stat.parent.name)] = int(fields[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    tree, frontier = set(), {pid}
+    while frontier:
+        tree |= frontier
+        frontier = {c for c, p in parents.items() if p in frontier} - tree
+    page = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    for p in tree:
+        try:
+            total += int((proc_dir / str(p) / "statm").read_text().split()[1]) * page
+        except (OSError, IndexError, ValueError):
+            pass
+    return total
+
+
+async def sample_memory(pid, samples, interval=0.5):
+    while True:
+        rss = _proc_tree_rss(pid)
+        if rss is not None:
+            samples.append(rss)
+        await asyncio.sleep(interval)
+
+
+def summarize(stats, elapsed, mem_samples, config):
+    """Turn raw measurements into a JSON-serialisable result."""
+    callbacks = {}
+    for name in CALLBACKS:
+        lat = np.array(stats.latencies.get(name, [])) * 1000
+        if not len(lat):
+            continue
+        p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+        callbacks[name] = {
+            "count": int(len(lat)),
+            "errors": stats.errors.get(name, 0),
+            "p50_ms": float(p50),
+            "p90_ms": float(p90),
+            "p99_ms": float(p99),
+            "max_ms": float(lat.max()),
+        }
+    all_lat = np.concatenate(
+        [np.array(v) for v in stats.latencies.values()] or [np.zeros(0)]
+    ) * 1000
+    total = int(len(all_lat))
+    errors = sum(stats.errors.values())
+    return {
+        "config": config,
+        "elapsed_s": elapsed,
+        "requests": total,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "error_rate": errors / total if total else 0.0,
+        "p50_ms": float(np.percentile(all_lat, 50)) if total else None,
+        "p99_ms": float(np.percentile(all_lat, 99)) if total else None,
+        "rss_peak_mb": max(mem_samples) / 2**20 if mem_samples else None,
+        "rss_end_mb": mem_samples[-1] / 2**20 if mem_samples else None,
+        "callbacks": callbacks,
+        "error_samples": dict(stats.error_samples),
+    }
+
+
+async def run_once(args, workers, rows):
+    """Start a server for one configuration, load it and return the summary."""
+    port = _free_port()
+    proc, log_path = start_server(args.server, workers, rows, args.seed, port)
+    try:
+        if not await wait_until_ready(port, proc, args.startup_timeout):
+            log = Path(log_path).read_text(errors="replace")
+            raise RuntimeError(
+                f"Server did not start (workers={workers}, rows={rows}):\n{log[-2000:]}"
+            )
+        stats = Stats()
+        mem_samples = []
+        sampler = asyncio.create_task(sample_memory(proc.pid, mem_samples))
+        rng = random.Random(args.seed)
+        start = time.monotonic()
+        deadline = start + args.duration
+        await asyncio.gather(
+            *(
+                analyst(port, stats, deadline, args.think_time, args.timeout,
+                        random.Random(rng.random()))
+                for _ in range(args.clients)
+            )
+        )
+        elapsed = time.monotonic() - start
+        sampler.cancel()
+        config = {
+            "server": args.server,
+            "workers": workers,
+            "rows": rows,
+            "clients": args.clients,
+            "duration": args.duration,
+            "think_time": args.think_time,
+        }
+        return summarize(stats, elapsed, mem_samples, config)
+    finally:
+        stop_server(proc)
+        os.unlink(log_path)
+
+
+def _fmt(value, spec):
+    if value is None:
+        return "-".rjust(int(spec.split(".")[0] or 0))
+    return format(value, spec)
+
+
+def print_result(result):
+    c = result["config"]
+    print(
+        f"\n== {c['server']} workers={c['workers']} rows={c['rows']} "
+        f"clients={c['clients']} duration={c['duration']}s =="
+    )
+    print(f"{'callback':<20}{'count':>8}{'errors':>8}{'p50 ms':>10}"
+          f"{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, cb in result["callbacks"].items():
+        print(f"{name:<20}{cb['count']:>8}{cb['errors']:>8}{cb['p50_ms']:>10.1f}"
+              f"{cb['p90_ms']:>10.1f}{cb['p99_ms']:>10.1f}{cb['max_ms']:>10.1f}")
+    print(
+        f"requests={result['requests']} "
+        f"throughput={result['throughput_rps']:.1f} req/s "
+        f"error_rate={result['error_rate']:.2%} "
+        f"rss_peak={_fmt(result['rss_peak_mb'], '.1f')} MB"
+    )
+    for name, err in result["error_samples"].items():
+        print(f"  first error in {name}: {err}")
+
+
+def print_comparison(results):
+    """Print one row per run so configurations can be compared side by side."""
+    print(f"\n{'server':<10}{'workers':>8}{'rows':>8}{'clients':>8}{'req/s':>9}"
+          f"{'p50 ms':>9}{'p99 ms':>10}{'errors':>8}{'rss MB':>9}")
+    for r in results:
+        c = r["config"]
+        print(
+            f"{c['server']:<10}{c['workers']:>8}{c['rows']:>8}{c['clients']:>8}"
+            f"{r['throughput_rps']:>9.1f}{_fmt(r['p50_ms'], '9.1f')}"
+            f"{_fmt(r['p99_ms'], '10.1f')}{r['error_rate']:>8.1%}"
+            f"{_fmt(r['rss_peak_mb'], '9.1f')}"
+        )
+
+
+def run(args):
+    results = []
+    for workers, rows in itertools.product(args.workers, args.rows):
+        result = asyncio.run(run_once(args, workers, rows))
+        print_result(result)
+        results.append(result)
+    if len(results) > 1:
+        print_comparison(results)
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+        print(f"\nSaved {len(results)} run(s) to {args.save}")
+
+
+def compare(args):
+    results = []
+    for path in args.files:
+        results.extend(json.loads(Path(path).read_text()))
+    print_comparison(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="Start the app and load-test it")
+    p_run.add_argument("--clients", type=int, default=50,
+                       help="Concurrent analyst sessions (default: 50)")
+    p_run.add_argument("--duration", type=float, default=30,
+                       help="Seconds of load per configuration (default: 30)")
+    p_run.add_argument("--think-time", type=float, default=1.0,
+                       help="Mean seconds between analyst actions (default: 1.0)")
+    p_run.add_argument("--server", choices=["werkzeug", "gunicorn"], default="werkzeug")
+    p_run.add_argument("--workers", type=int, nargs="+", default=[1],
+                       help="Worker processes; several values are compared")
+    p_run.add_argument("--rows", type=int, nargs="+", default=[5000],
+                       help="Synthetic applicants; several values are compared")
+    p_run.add_argument("--seed", type=int, default=0)
+    p_run.add_argument("--timeout", type=float, default=30,
+                       help="Per-request timeout in seconds (default: 30)")
+    p_run.add_argument("--startup-timeout", type=float, default=60)
+    p_run.add_argument("--save", help="Write results as JSON to this path")
+    p_run.set_defaults(func=run)
+
+    p_cmp = sub.add_parser("compare", help="Compare results saved with --save")
+    p_cmp.add_argument("files", nargs="+")
+    p_cmp.set_defaults(func=compare)
+
+    p_serve = sub.add_parser("serve", help=argparse.SUPPRESS)
+    p_serve.add_argument("--port", type=int, required=True)
+    p_serve.add_argument("--workers", type=int, default=1)
+    p_serve.set_defaults(func=serve)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()